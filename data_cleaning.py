@@ -8,25 +8,28 @@ def clean_ets_input(df: pd.DataFrame) -> pd.DataFrame:
     - Sayısal kolonları numeric'e çevirir
     - Zorunlu kolonlarda NA varsa atar
     - Generation_MWh > 0 ve Emissions_tCO2 >= 0 şartı uygular
-    """
-    x = df.copy()
 
+    Tüm filtreler tek bir maskede birleştirilir; ham tablonun tamamı
+    kopyalanmaz, yalnızca tutulan satırlar yeni tabloya alınır.
+    """
     # Zorunlu kolonlar
     required = ["Plant", "FuelType", "Emissions_tCO2", "Generation_MWh"]
     for c in required:
-        if c not in x.columns:
+        if c not in df.columns:
             raise ValueError(f"Excel kolon eksik: {c}")
 
-    x["Emissions_tCO2"] = pd.to_numeric(x["Emissions_tCO2"], errors="coerce")
-    x["Generation_MWh"] = pd.to_numeric(x["Generation_MWh"], errors="coerce")
-
-    x = x.dropna(subset=required)
-    x = x[(x["Generation_MWh"] > 0) & (x["Emissions_tCO2"] >= 0)]
+    em = pd.to_numeric(df["Emissions_tCO2"], errors="coerce")
+    gen = pd.to_numeric(df["Generation_MWh"], errors="coerce")
 
-    # Plant string temizliği (opsiyonel ama faydalı)
-    x["Plant"] = x["Plant"].astype(str).str.strip()
+    # NaN karşılaştırmaları False döner: sayısal kolonlardaki NA'lar da bu maskeyle düşer
+    keep = df["Plant"].notna() & df["FuelType"].notna() & (gen > 0) & (em >= 0)
 
-    return x
+    return df.loc[keep].assign(
+        Emissions_tCO2=em[keep],
+        Generation_MWh=gen[keep],
+        # Plant string temizliği (opsiyonel ama faydalı)
+        Plant=df.loc[keep, "Plant"].astype(str).str.strip(),
+    )
 
 
 def filter_intensity_outliers_by_fuel(
@@ -45,36 +48,43 @@ def filter_intensity_outliers_by_fuel(
 
     Dönüş:
       cleaned_df, removed_df
-    """
-    x = df.copy()
-    x["intensity"] = x["Emissions_tCO2"] / x["Generation_MWh"]
-
-    keep_mask = np.ones(len(x), dtype=bool)
-    removed_rows = []
-
-    for ft, g in x.groupby("FuelType"):
-        gen = g["Generation_MWh"].sum()
-        em = g["Emissions_tCO2"].sum()
-        if gen <= 0:
-            continue
 
-        B = em / gen
-        lo = B * (1.0 - float(lower_pct))
-        hi = B * (1.0 + float(upper_pct))
-
-        idx = g.index
-        ok = (g["intensity"] >= lo) & (g["intensity"] <= hi)
-
-        keep_mask[idx] = ok.to_numpy()
-
-        removed = g.loc[~ok, ["Plant", "FuelType", "Generation_MWh", "Emissions_tCO2", "intensity"]].copy()
-        if not removed.empty:
-            removed["Benchmark_B"] = B
-            removed["LowerBound"] = lo
-            removed["UpperBound"] = hi
-            removed_rows.append(removed)
-
-    removed_df = pd.concat(removed_rows, ignore_index=True) if removed_rows else pd.DataFrame()
-    cleaned_df = x.loc[keep_mask].drop(columns=["intensity"], errors="ignore").copy()
+    Yakıt toplamları tek geçişte (factorize + bincount) hesaplanır;
+    yakıt başına döngü ve tablo kopyası yoktur.
+    """
+    em = df["Emissions_tCO2"].to_numpy(dtype=float)
+    gen = df["Generation_MWh"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intensity = em / gen
+
+    # yakıt kodları groupby sırasıyla (sort=True); eksik FuelType -> -1, dokunulmaz
+    codes, fuels = pd.factorize(df["FuelType"], sort=True)
+    has_fuel = codes >= 0
+    c = np.where(has_fuel, codes, 0)
+
+    gen_sum = np.bincount(codes[has_fuel], weights=gen[has_fuel], minlength=len(fuels))
+    em_sum = np.bincount(codes[has_fuel], weights=em[has_fuel], minlength=len(fuels))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        B = em_sum / gen_sum
+    lo = B * (1.0 - float(lower_pct))
+    hi = B * (1.0 + float(upper_pct))
+
+    # toplam üretimi <= 0 olan yakıtlar filtrelenmez
+    checked = has_fuel & (gen_sum[c] > 0)
+    ok = (intensity >= lo[c]) & (intensity <= hi[c])
+    drop = checked & ~ok
+
+    if drop.any():
+        removed_df = df.loc[drop, ["Plant", "FuelType", "Generation_MWh", "Emissions_tCO2"]].assign(
+            intensity=intensity[drop],
+            Benchmark_B=B[c[drop]],
+            LowerBound=lo[c[drop]],
+            UpperBound=hi[c[drop]],
+        )
+        # yakıt yakıt listelenir (yakıt içinde orijinal sıra)
+        removed_df = removed_df.iloc[np.argsort(c[drop], kind="stable")].reset_index(drop=True)
+    else:
+        removed_df = pd.DataFrame()
+    cleaned_df = df.loc[~drop]
 
     return cleaned_df, removed_df
@@ -15,11 +15,10 @@ def _compute_benchmarks(
     out = {}
 
     if benchmark_method == "generation_weighted":
-        g = x.groupby("FuelType", as_index=False)[["Emissions_tCO2", "Generation_MWh"]].sum()
+        g = x.groupby("FuelType", as_index=False, observed=True)[["Emissions_tCO2", "Generation_MWh"]].sum()
         g["B"] = g["Emissions_tCO2"] / g["Generation_MWh"].replace(0, np.nan)
-        for _, r in g.iterrows():
-            out[r["FuelType"]] = float(r["B"]) if np.isfinite(r["B"]) else np.nan
-        return out
+        # build the map column-wise; non-finite benchmarks become NaN
+        return dict(zip(g["FuelType"], g["B"].where(np.isfinite(g["B"])).tolist()))
 
     if benchmark_method == "capacity_weighted":
         # weighted by InstalledCapacity_MW, needs cap_col
@@ -27,40 +26,42 @@ def _compute_benchmarks(
             raise ValueError(f"capacity_weighted benchmark requires column '{cap_col}' in input data.")
         # plant-level EI then capacity-weighted average
         plant = (
-            x.groupby(["FuelType", "Plant"], as_index=False)[["Emissions_tCO2", "Generation_MWh", cap_col]]
+            x.groupby(["FuelType", "Plant"], as_index=False, observed=True)[["Emissions_tCO2", "Generation_MWh", cap_col]]
             .sum()
         )
         plant["EI"] = plant["Emissions_tCO2"] / plant["Generation_MWh"].replace(0, np.nan)
         plant = plant.dropna(subset=["EI"])
-        g = plant.groupby("FuelType", as_index=False).apply(
-            lambda df: np.average(df["EI"], weights=df[cap_col].replace(0, np.nan))
-        )
-        g = g.reset_index().rename(columns={0: "B"})
-        for _, r in g.iterrows():
-            out[r["FuelType"]] = float(r["B"]) if np.isfinite(r["B"]) else np.nan
-        return out
+        # weighted mean as two grouped sums (sum(EI*w) / sum(w)) instead of a per-fuel apply;
+        # like np.average, a fuel with any missing/zero capacity weight gets NaN
+        w = plant[cap_col].replace(0, np.nan)
+        by_fuel = plant.assign(_wEI=plant["EI"] * w, _w=w, _w_na=w.isna()).groupby("FuelType", observed=True)
+        g = by_fuel[["_wEI", "_w", "_w_na"]].sum()
+        B = (g["_wEI"] / g["_w"]).where(g["_w_na"] == 0)
+        return dict(zip(g.index, B.where(np.isfinite(B)).tolist()))
 
     if benchmark_method == "best_plants":
         # "best plants" defined by lowest EI covering X% of generation (benchmark_top_pct)
         pct = int(benchmark_top_pct)
         pct = max(10, min(100, pct))
 
-        plant = x.groupby(["FuelType", "Plant"], as_index=False)[["Emissions_tCO2", "Generation_MWh"]].sum()
+        plant = x.groupby(["FuelType", "Plant"], as_index=False, observed=True)[["Emissions_tCO2", "Generation_MWh"]].sum()
         plant["EI"] = plant["Emissions_tCO2"] / plant["Generation_MWh"].replace(0, np.nan)
         plant = plant.dropna(subset=["EI"])
 
-        for ft, g in plant.groupby("FuelType"):
-            gg = g.sort_values("EI", ascending=True).copy()
-            gg["cum_gen"] = gg["Generation_MWh"].cumsum()
+        for ft, g in plant.groupby("FuelType", observed=True):
+            # sort_values already returns a new frame; the running total stays a local Series
+            gg = g.sort_values("EI", ascending=True)
+            cum_gen = gg["Generation_MWh"].cumsum()
             total = float(gg["Generation_MWh"].sum())
             if total <= 0:
                 out[ft] = np.nan
                 continue
             threshold = total * (pct / 100.0)
-            sel = gg[gg["cum_gen"] <= threshold]
+            sel = gg[cum_gen <= threshold]
             if sel.empty:
                 sel = gg.head(1)
-            b = float(sel["Emissions_tCO2"].sum() / sel["Generation_MWh"].sum())
+            e, gen = sel[["Emissions_tCO2", "Generation_MWh"]].to_numpy(dtype=float).sum(axis=0)
+            b = float(e / gen)
             out[ft] = b if np.isfinite(b) else np.nan
 
         return out
@@ -92,24 +93,22 @@ def ets_hesapla(
       clearing_price (float)
     """
 
-    x = df.copy()
-
     # Standardize
     for c in ["Emissions_tCO2", "Generation_MWh"]:
-        if c not in x.columns:
+        if c not in df.columns:
             raise ValueError(f"Input data must include '{c}' column.")
-    if "Plant" not in x.columns:
+    if "Plant" not in df.columns:
         raise ValueError("Input data must include 'Plant' column.")
-    if "FuelType" not in x.columns:
+    if "FuelType" not in df.columns:
         raise ValueError("Input data must include 'FuelType' column.")
 
-    x["Emissions_tCO2"] = pd.to_numeric(x["Emissions_tCO2"], errors="coerce")
-    x["Generation_MWh"] = pd.to_numeric(x["Generation_MWh"], errors="coerce")
-    if cap_col in x.columns:
-        x[cap_col] = pd.to_numeric(x[cap_col], errors="coerce")
+    # numeric inputs
+    num_cols = ["Emissions_tCO2", "Generation_MWh"] + ([cap_col] if cap_col in df.columns else [])
+    x = df[["Plant", "FuelType"] + num_cols]
+    x = x.assign(**{c: pd.to_numeric(x[c], errors="coerce") for c in num_cols})
 
-    x = x.dropna(subset=["Emissions_tCO2", "Generation_MWh"])
-    x = x[x["Generation_MWh"] > 0].copy()
+    # NaN comparisons are False: one mask drops missing values and non-positive generation
+    x = x[x["Emissions_tCO2"].notna() & (x["Generation_MWh"] > 0)].copy()
 
     # 1) Plant-level EI
     x["intensity"] = x["Emissions_tCO2"] / x["Generation_MWh"].replace(0, np.nan)
@@ -127,7 +126,7 @@ def ets_hesapla(
 
         # plant-level EI within fuel
         plant_agg = (
-            x.groupby(["FuelType", "Plant"], as_index=False)[["Emissions_tCO2", "Generation_MWh"]]
+            x.groupby(["FuelType", "Plant"], as_index=False, observed=True)[["Emissions_tCO2", "Generation_MWh"]]
             .sum()
         )
         plant_agg["EI"] = plant_agg["Emissions_tCO2"] / plant_agg["Generation_MWh"].replace(0, np.nan)
@@ -135,9 +134,10 @@ def ets_hesapla(
 
         tier_rows = []
         benchmark_map = {}
+        best_by_fuel, worst_by_fuel = {}, {}
 
-        for ft, g in plant_agg.groupby("FuelType"):
-            gg = g.sort_values("EI", ascending=True).copy()
+        for ft, g in plant_agg.groupby("FuelType", observed=True):
+            gg = g.sort_values("EI", ascending=True)
             n = len(gg)
             if n == 0:
                 continue
@@ -145,14 +145,13 @@ def ets_hesapla(
             cut = int(np.ceil(n * (tier_best_pct_i / 100.0)))
             cut = max(1, min(n - 1, cut)) if n >= 2 else 1
 
-            gg["Tier"] = "Best"
-            if n >= 2:
-                gg.loc[gg.index[cut:], "Tier"] = "Worst"
+            # plants past the cut form the worst tier (none when n == 1, since cut == 1)
+            gg = gg.assign(Tier=np.where(np.arange(n) >= cut, "Worst", "Best"))
 
             # Benchmarks (generation-weighted EI) per tier
             def _tier_bench(df_tier: pd.DataFrame) -> float:
-                e = float(df_tier["Emissions_tCO2"].sum())
-                gen = float(df_tier["Generation_MWh"].sum())
+                # both totals in one reduction over the two columns
+                e, gen = df_tier[["Emissions_tCO2", "Generation_MWh"]].to_numpy(dtype=float).sum(axis=0)
                 return float(e / gen) if gen > 0 else np.nan
 
             b_best = _tier_bench(gg[gg["Tier"] == "Best"])
@@ -161,6 +160,7 @@ def ets_hesapla(
             # Store in benchmark_map with readable keys
             benchmark_map[f"{ft} | Best tier"] = b_best
             benchmark_map[f"{ft} | Worst tier"] = b_worst
+            best_by_fuel[ft], worst_by_fuel[ft] = b_best, b_worst
 
             tier_rows.append(gg[["FuelType", "Plant", "Tier"]])
 
@@ -172,14 +172,13 @@ def ets_hesapla(
         x = x.merge(tier_df, on=["FuelType", "Plant"], how="left")
         x["Tier"] = x["Tier"].fillna("Best")  # fallback
 
-        # Map tier benchmark to rows
-        def _tier_benchmark_for_row(row) -> float:
-            ft = row["FuelType"]
-            if row["Tier"] == "Worst":
-                return benchmark_map.get(f"{ft} | Worst tier", np.nan)
-            return benchmark_map.get(f"{ft} | Best tier", np.nan)
-
-        x["B_fuel"] = x.apply(_tier_benchmark_for_row, axis=1)
+        # Map tier benchmark to rows: per-fuel maps are applied to FuelType directly
+        # (on a categorical only the categories are looked up), then picked by tier
+        x["B_fuel"] = np.where(
+            x["Tier"] == "Worst",
+            x["FuelType"].map(worst_by_fuel).astype(float),
+            x["FuelType"].map(best_by_fuel).astype(float),
+        )
 
     else:
         benchmark_map = _compute_benchmarks(
@@ -188,73 +187,79 @@ def ets_hesapla(
             benchmark_top_pct=int(benchmark_top_pct),
             cap_col=cap_col,
         )
-        x["B_fuel"] = x["FuelType"].map(benchmark_map)
+        # FuelType may be categorical: map() would return a categorical, keep B_fuel numeric
+        x["B_fuel"] = x["FuelType"].map(benchmark_map).astype(float)
 
     if "Tier" not in x.columns:
         x["Tier"] = "All"
 
+    # Steps 3-5 are row-wise arithmetic: read the inputs once as arrays (no index alignment)
+    B = x["B_fuel"].to_numpy(dtype=float)
+    ei = x["intensity"].to_numpy(dtype=float)
+
     # 3) AGK smoothing (effective intensity around benchmark)
     # EI_eff = B + (EI - B)*(1-AGK)
-    x["EI_eff"] = x["B_fuel"] + (x["intensity"] - x["B_fuel"]) * (1 - float(agk))
+    x["EI_eff"] = B + (ei - B) * (1 - float(agk))
 
     # 4) Allocation & net ETS (tCO2)
     # Allowances = B_fuel * Generation
-    x["alloc"] = x["B_fuel"] * x["Generation_MWh"]
-    x["net_ets"] = x["Emissions_tCO2"] - x["alloc"]
+    alloc = B * x["Generation_MWh"].to_numpy(dtype=float)
+    net = x["Emissions_tCO2"].to_numpy(dtype=float) - alloc
 
     # 5) Optional transition compensation (TRF): reduce net_ets if intensity > benchmark
     # (Only for net buyers; matches your pilot notion)
     trf = float(trf)
     if trf > 0:
-        x["net_ets"] = np.where(
-            x["intensity"] > x["B_fuel"],
-            x["net_ets"] * (1 - trf),
-            x["net_ets"],
-        )
+        net = np.where(ei > B, net * (1 - trf), net)
+
+    x["alloc"] = alloc
+    x["net_ets"] = net
 
     # 6) Price formation inputs (simple bid/ask construction)
     # bids for buyers: p_bid = clamp(price_min, price_max, ...)
     # asks for sellers: p_ask = clamp(price_min, price_max, ...)
     # NOTE: This is a stylized market-curve visualization; "Auction Clearing" uses fixed supply share.
-    net = x["net_ets"].astype(float)
+    # buyer/seller masks are computed once and reused for slicing and for the totals below
+    is_buyer = net > 0
+    is_seller = net < 0
 
     # Construct stylized willingness-to-pay/accept curves
     # buyers: higher net => higher WTP; sellers: higher surplus => lower ask (or vice versa)
     # We'll keep it monotone but bounded
-    buyers = x[net > 0].copy()
-    sellers = x[net < 0].copy()
+    buyers = x[is_buyer]
+    sellers = x[is_seller]
 
-    def _clamp(p):
-        return float(np.clip(p, float(price_min), float(price_max)))
+    def _quote(q: pd.Series) -> pd.Series:
+        # min-max normalized quantity -> bounded price, for all plants in one array expression
+        # constants folded into one scalar scale/offset: a subtract and a multiply per plant
+        lo, hi = float(price_min), float(price_max)
+        q_min = q.min()
+        scale = 0.8 * (hi - lo) / (q.max() - q_min + 1e-9)
+        return np.clip((lo + 0.2 * (hi - lo)) + (q - q_min) * scale, lo, hi)
 
     if not buyers.empty:
-        q = buyers["net_ets"].astype(float)
-        qn = (q - q.min()) / (q.max() - q.min() + 1e-9)
-        buyers["p_bid"] = qn.apply(lambda z: _clamp(price_min + (price_max - price_min) * (0.2 + 0.8 * z)))
-        buyers["p_bid"] = buyers["p_bid"] + float(spread) / 2.0
+        buyers = buyers.assign(p_bid=_quote(buyers["net_ets"].astype(float)) + float(spread) / 2.0)
     else:
-        buyers["p_bid"] = np.nan
+        buyers = buyers.assign(p_bid=np.nan)
 
     if not sellers.empty:
-        q = (-sellers["net_ets"].astype(float))
-        qn = (q - q.min()) / (q.max() - q.min() + 1e-9)
-        sellers["p_ask"] = qn.apply(lambda z: _clamp(price_min + (price_max - price_min) * (0.2 + 0.8 * z)))
-        sellers["p_ask"] = sellers["p_ask"] - float(spread) / 2.0
+        sellers = sellers.assign(p_ask=_quote(-sellers["net_ets"].astype(float)) - float(spread) / 2.0)
     else:
-        sellers["p_ask"] = np.nan
+        sellers = sellers.assign(p_ask=np.nan)
 
     x = pd.concat([buyers, sellers], ignore_index=True)
 
     # 7) Clearing price
-    demand = float(x.loc[x["net_ets"] > 0, "net_ets"].sum())
-    supply_surplus = float((-x.loc[x["net_ets"] < 0, "net_ets"]).sum())
+    # both totals are reduced from the same array with the masks built above
+    demand = float(net[is_buyer].sum())
+    supply_surplus = float(-net[is_seller].sum())
 
     clearing_price = float(price_min)
 
     if price_method == "Average Compliance Cost":
         # Simple average cost proxy: mean of buyer bids (bounded)
-        if demand > 0 and "p_bid" in x.columns:
-            clearing_price = float(np.nanmean(x.loc[x["net_ets"] > 0, "p_bid"]))
+        if demand > 0:
+            clearing_price = float(np.nanmean(buyers["p_bid"]))
         clearing_price = float(np.clip(clearing_price, float(price_min), float(price_max)))
 
     elif price_method == "Auction Clearing":
@@ -7,11 +7,21 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 
+import hashlib
 from io import BytesIO
+import xlsxwriter
 
 from ets_model import ets_hesapla
 from data_cleaning import clean_ets_input
 
+# Rust-based xlsx reader (pandas engine "calamine"); fall back to openpyxl when not installed
+try:
+    import python_calamine  # noqa: F401
+
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
 
 # ============================================================
 # DEFAULTS
@@ -75,13 +85,64 @@ def kpi_card(label, value, sub=""):
 # HELPERS
 # ============================================================
 def read_all_sheets(file) -> pd.DataFrame:
-    xls = pd.ExcelFile(file)
-    frames = []
-    for sh in xls.sheet_names:
-        df = pd.read_excel(xls, sh)
-        df["FuelType"] = sh
-        frames.append(df)
-    return pd.concat(frames, ignore_index=True)
+    # sheet_name=None: one pass over the workbook returns {sheet: frame} for every sheet
+    sheets = pd.read_excel(file, sheet_name=None, engine=EXCEL_ENGINE)
+    # stack the sheets once, then tag FuelType from the sheet sizes: one code array
+    # over a shared (sorted) category set instead of per-row strings
+    out = pd.concat(sheets.values(), ignore_index=True)
+    fuels = sorted(sheets)
+    codes = np.repeat([fuels.index(sh) for sh in sheets], [len(df) for df in sheets.values()])
+    out["FuelType"] = pd.Categorical.from_codes(codes, categories=fuels)
+    return out
+
+
+@st.cache_data(show_spinner="Reading Excel...", max_entries=8)
+def _load_input(file_bytes: bytes) -> pd.DataFrame:
+    """Parse + clean the upload once per distinct file content; widget reruns hit the cache.
+
+    In-memory only, bounded to the most recent uploads (LRU eviction).
+    """
+    return clean_ets_input(read_all_sheets(BytesIO(file_bytes)))
+
+
+@st.cache_data(show_spinner="Running ETS model...", max_entries=64)
+def _run_ets(_df: pd.DataFrame, data_key, price_min, price_max, agk, **kwargs):
+    """Memoized ets_hesapla: identical (data, parameters) reruns return instantly.
+
+    Keyed on ``data_key`` (upload digest + scope picks), not on the frame:
+    Streamlit's DataFrame hash samples large frames, so ``_df`` is not hashed.
+    Each parameter tweak adds an entry, so the cache is bounded (LRU eviction).
+    """
+    return ets_hesapla(_df, price_min, price_max, agk, **kwargs)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _to_excel_bytes(_df_res: pd.DataFrame, _bm_ref: dict, _bm_sc2: dict, result_key):
+    """Results + benchmark maps as .xlsx bytes; cached per result set.
+
+    Keyed on ``result_key`` (run key + fx rate), which determines the inputs;
+    they are underscored so Streamlit does not hash (and sample) the frame.
+    """
+    # constant_memory: xlsxwriter flushes each finished row to a temp file instead of
+    # keeping the whole sheet in memory (rows must be written in order, as below)
+    buf = BytesIO()
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True, "nan_inf_to_errors": True})
+    bold = wb.add_format({"bold": True})
+
+    def _write_sheet(name: str, header: list, rows):
+        ws = wb.add_worksheet(name)
+        ws.write_row(0, 0, header, bold)
+        for r, row in enumerate(rows, start=1):
+            # NaN -> empty cell, as DataFrame.to_excel does
+            ws.write_row(r, 0, [None if isinstance(v, float) and np.isnan(v) else v for v in row])
+
+    _write_sheet("Results_All", [str(c) for c in _df_res.columns], _df_res.itertuples(index=False, name=None))
+    # benchmark maps are written straight from the dict items, no intermediate frame
+    _write_sheet("Benchmark_Ref", ["BenchmarkKey", "Value"], _bm_ref.items())
+    _write_sheet("Benchmark_Sc2", ["BenchmarkKey", "Value"], _bm_sc2.items())
+
+    wb.close()
+    return buf.getvalue()
 
 
 def _fuel_group_of(ft: str) -> str:
@@ -109,7 +170,8 @@ def _fuel_label(ft: str, default=None) -> str:
 def _apply_scope(df: pd.DataFrame, group_code: str, option: str, n: int = 5):
     if option == "Include all plants":
         return df, []
-    dfg = df[df["FuelType"].apply(_fuel_group_of) == group_code].copy()
+    mask_group = df["FuelType"].apply(_fuel_group_of) == group_code
+    dfg = df.loc[mask_group, ["Plant", "Emissions_tCO2", "Generation_MWh"]]
     if dfg.empty:
         return df, []
 
@@ -119,11 +181,13 @@ def _apply_scope(df: pd.DataFrame, group_code: str, option: str, n: int = 5):
     if agg.empty:
         return df, []
 
-    asc = option == "Exclude 5 plants with LOWEST EI"
-    picks = agg.sort_values("EI", ascending=asc).head(n)["Plant"].tolist()
+    # partial selection of the n extreme-EI plants instead of sorting the whole group
+    if option == "Exclude 5 plants with LOWEST EI":
+        picks = agg.nsmallest(n, "EI")["Plant"].tolist()
+    else:
+        picks = agg.nlargest(n, "EI")["Plant"].tolist()
 
-    mask_group = df["FuelType"].apply(_fuel_group_of) == group_code
-    df2 = df[~(mask_group & df["Plant"].isin(picks))].copy()
+    df2 = df[~(mask_group & df["Plant"].isin(picks))]
     return df2, picks
 
 
@@ -327,16 +391,15 @@ if uploaded is None:
     st.info("Lütfen Excel dosyası yükleyin.")
     st.stop()
 
-df_all_raw = read_all_sheets(uploaded)
-df_all = clean_ets_input(df_all_raw)
+file_bytes = uploaded.getvalue()
+upload_digest = hashlib.sha256(file_bytes).hexdigest()
+df_all = _load_input(file_bytes)
 
-# Apply scope filters (drops plants from calculation if chosen)
-df_scoped = df_all.copy()
+# Apply scope filters (drops plants from calculation if chosen).
 dropped = {"DG": [], "IMPORT_COAL": [], "LIGNITE": []}
-df_scoped, dropped["DG"] = _apply_scope(df_scoped, "DG", st.session_state.get("scope_dg", "Include all plants"))
-df_scoped, dropped["IMPORT_COAL"] = _apply_scope(df_scoped, "IMPORT_COAL", st.session_state.get("scope_import", "Include all plants"))
-df_scoped, dropped["LIGNITE"] = _apply_scope(df_scoped, "LIGNITE", st.session_state.get("scope_lignite", "Include all plants"))
-df_all = df_scoped
+df_all, dropped["DG"] = _apply_scope(df_all, "DG", st.session_state.get("scope_dg", "Include all plants"))
+df_all, dropped["IMPORT_COAL"] = _apply_scope(df_all, "IMPORT_COAL", st.session_state.get("scope_import", "Include all plants"))
+df_all, dropped["LIGNITE"] = _apply_scope(df_all, "LIGNITE", st.session_state.get("scope_lignite", "Include all plants"))
 
 if any(len(v) > 0 for v in dropped.values()):
     st.sidebar.caption("Dropped plants (by scope):")
@@ -354,10 +417,37 @@ if any(len(v) > 0 for v in dropped.values()):
 st.divider()
 run = st.button("Run BOTH Scenarios (Reference + Scenario 2)")
 
+# everything the two model runs depend on; display-only inputs (fx rate, filters) excluded
+# df_all is fully determined by the upload content and the scope picks
+data_key = (upload_digest, scope_dg, scope_import, scope_lignite)
+run_key = (
+    data_key,
+    price_min,
+    price_max,
+    slope_bid,
+    slope_ask,
+    spread,
+    benchmark_method_code,
+    int(benchmark_top_pct_common),
+    int(tier_best_pct_common),
+    float(trf),
+    agk_ref,
+    price_method_ref,
+    float(auction_supply_share_ref),
+    agk_sc2,
+    price_method_sc2,
+    float(auction_supply_share_sc2),
+)
 if run:
+    st.session_state["_ets_run_key"] = run_key
+
+# Results stay on screen across reruns triggered by the widgets below (fuel filter,
+# scenario toggles) while the inputs are unchanged; _run_ets then answers from its cache.
+if run or st.session_state.get("_ets_run_key") == run_key:
     # Scenario 1
-    sonuc_ref, bench_ref, price_ref = ets_hesapla(
+    sonuc_ref, bench_ref, price_ref = _run_ets(
         df_all,
+        data_key,
         price_min,
         price_max,
         agk_ref,
@@ -374,8 +464,9 @@ if run:
     )
 
     # Scenario 2
-    sonuc_sc2, bench_sc2, price_sc2 = ets_hesapla(
+    sonuc_sc2, bench_sc2, price_sc2 = _run_ets(
         df_all,
+        data_key,
         price_min,
         price_max,
         agk_sc2,
@@ -412,25 +503,30 @@ if run:
         key="fuel_filter_comp",
     )
 
-    def _apply_fuel_filter(df, fuel_label):
-        if fuel_label == "All":
-            return df
-        return df[df["FuelType"].apply(lambda z: _fuel_label(z, "Other")) == fuel_label].copy()
+    # fuel-filter row selection, computed once per scenario and shared by both charts below
+    def _fuel_rows(df_out: pd.DataFrame):
+        if fuel_choice == "All":
+            return slice(None)
+        return df_out["FuelType"].map(lambda z: _fuel_label(z, "Other")) == fuel_choice
+
+    rows_ref = _fuel_rows(sonuc_ref)
+    rows_sc2 = _fuel_rows(sonuc_sc2)
 
-    ref = _apply_fuel_filter(sonuc_ref.copy(), fuel_choice)
-    sc2 = _apply_fuel_filter(sonuc_sc2.copy(), fuel_choice)
+    # project to the two columns the comparison needs; assign builds new frames
+    ref = sonuc_ref.loc[rows_ref, ["Plant", "ets_net_cashflow_€/MWh"]]
+    sc2 = sonuc_sc2.loc[rows_sc2, ["Plant", "ets_net_cashflow_€/MWh"]]
 
-    ref["TL_per_MWh_Ref"] = ref["ets_net_cashflow_€/MWh"] * float(fx_rate)
-    sc2["TL_per_MWh_Sc2"] = sc2["ets_net_cashflow_€/MWh"] * float(fx_rate)
+    ref = ref.assign(TL_per_MWh_Ref=ref["ets_net_cashflow_€/MWh"] * float(fx_rate))
+    sc2 = sc2.assign(TL_per_MWh_Sc2=sc2["ets_net_cashflow_€/MWh"] * float(fx_rate))
 
     comp = ref.merge(sc2[["Plant", "TL_per_MWh_Sc2"]], on="Plant", how="inner")
     comp["Δ_TL_per_MWh"] = comp["TL_per_MWh_Sc2"] - comp["TL_per_MWh_Ref"]
 
-    comp = comp.sort_values("Δ_TL_per_MWh")
-
     top_n = 30
     if len(comp) > top_n:
-        comp = comp.reindex(comp["Δ_TL_per_MWh"].abs().sort_values(ascending=False).head(top_n).index)
+        # O(N) selection of the top_n largest |Δ|; no ordering needed, the chart sorts by plant
+        delta_abs = comp["Δ_TL_per_MWh"].abs().to_numpy()
+        comp = comp.iloc[np.argpartition(-delta_abs, top_n - 1)[:top_n]]
 
     # side-by-side bars
     comp_melt = comp.melt(
@@ -467,23 +563,18 @@ if run:
     show_sc2 = st.checkbox("Show Scenario 2", value=True)
 
     # build ranked series by plant, using EI_eff mean (already includes AGK + benchmark)
-    def _rank_df(df_out: pd.DataFrame, label: str):
-        d = df_out.copy()
-        d["FuelGroup"] = d["FuelType"].apply(lambda z: _fuel_label(z, "Other"))
-        if fuel_choice != "All":
-            d = d[d["FuelGroup"] == fuel_choice].copy()
+    def _rank_df(df_out: pd.DataFrame, rows, label: str):
+        d = df_out.loc[rows, ["Plant", "FuelType", "EI_eff"]]
 
         # sort by EI_eff
-        d = d.sort_values("EI_eff", ascending=True).reset_index(drop=True)
-        d["Rank"] = np.arange(1, len(d) + 1)
-        d["Scenario"] = label
-        return d
+        d = d.sort_values("EI_eff", ascending=True, ignore_index=True)
+        return d.assign(Rank=np.arange(1, len(d) + 1), Scenario=label)
 
     lines = []
     if show_ref:
-        lines.append(_rank_df(sonuc_ref, "Reference"))
+        lines.append(_rank_df(sonuc_ref, rows_ref, "Reference"))
     if show_sc2:
-        lines.append(_rank_df(sonuc_sc2, "Scenario 2"))
+        lines.append(_rank_df(sonuc_sc2, rows_sc2, "Scenario 2"))
 
     if lines:
         plot_df = pd.concat(lines, ignore_index=True)
@@ -548,11 +639,11 @@ if run:
 
     # add TL columns + keep capacity next to plant if exists
     def _enrich(df_out: pd.DataFrame, scenario_name: str) -> pd.DataFrame:
-        d = df_out.copy()
-        d["Scenario"] = scenario_name
-        d["ETS_TL_total"] = d["ets_net_cashflow_€"] * float(fx_rate)
-        d["ETS_TL_per_MWh"] = d["ets_net_cashflow_€/MWh"] * float(fx_rate)
-        return d
+        return df_out.assign(
+            Scenario=scenario_name,
+            ETS_TL_total=df_out["ets_net_cashflow_€"] * float(fx_rate),
+            ETS_TL_per_MWh=df_out["ets_net_cashflow_€/MWh"] * float(fx_rate),
+        )
 
     ref_x = _enrich(sonuc_ref, "Reference")
     sc2_x = _enrich(sonuc_sc2, "Scenario 2")
@@ -567,27 +658,26 @@ if run:
     rest = [c for c in out_all.columns if c not in front]
     out_all = out_all[front + rest]
 
-    st.dataframe(out_all, use_container_width=True)
-
-    # Excel download (same columns as above)
-    def _to_excel_bytes(df_res: pd.DataFrame, bm_ref: dict, bm_sc2: dict):
-        buf = BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            df_res.to_excel(writer, index=False, sheet_name="Results_All")
-            pd.DataFrame({"BenchmarkKey": list(bm_ref.keys()), "Value": list(bm_ref.values())}).to_excel(
-                writer, index=False, sheet_name="Benchmark_Ref"
-            )
-            pd.DataFrame({"BenchmarkKey": list(bm_sc2.keys()), "Value": list(bm_sc2.values())}).to_excel(
-                writer, index=False, sheet_name="Benchmark_Sc2"
-            )
-        buf.seek(0)
-        return buf.getvalue()
-
-    excel_bytes = _to_excel_bytes(out_all, bench_ref, bench_sc2)
+    # by default only the first rows of each scenario go to the browser;
+    # the full table is opt-in and always in the Excel download
+    max_rows_per_scenario = 250
+    show_full = st.checkbox("Show full table", value=False)
+    if show_full or len(out_all) <= 2 * max_rows_per_scenario:
+        st.dataframe(out_all, use_container_width=True)
+    else:
+        st.dataframe(out_all.groupby("Scenario", sort=False).head(max_rows_per_scenario), use_container_width=True)
+        st.caption(
+            f"Showing the first {max_rows_per_scenario:,} rows of each scenario ({len(out_all):,} rows in total); "
+            "tick 'Show full table' or download the Excel file for all rows."
+        )
 
+    # Excel download (same columns as above, all rows)
+    # The workbook is built only when the button is clicked (deferred callable);
+    # "ignore" skips the script rerun a download click would otherwise trigger.
     st.download_button(
         "Download results as Excel (.xlsx)",
-        data=excel_bytes,
+        data=lambda: _to_excel_bytes(out_all, bench_ref, bench_sc2, (run_key, float(fx_rate))),
         file_name="ets_results_scenarios.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        on_click="ignore",
     )